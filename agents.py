@@ -2,13 +2,65 @@
 Multi-agent system for tourism planning
 """
 from openai import OpenAI
-from typing import Optional, Dict, List
-from api_clients import NominatimClient, OpenMeteoClient, OverpassClient
+from cachetools import LRUCache
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Optional, Dict, Iterator, List, Tuple
+from api_clients import NominatimClient, OpenMeteoClient, OverpassClient, WORKER_THREADS
+import logging
+import orjson
 import os
+import re
+import threading
 from dotenv import load_dotenv
 
+try:
+    import spacy  # Optional: local NER for place extraction
+except ImportError:
+    spacy = None
+
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# Intent keywords and their inflections, matched on word boundaries (so
+# "goal" doesn't count as "go")
+_WEATHER_RE = re.compile(
+    r"\b(temperatures?|weather|rain(?:s|y|ing|ed)?|hot(?:ter)?|cold(?:er)?|forecast(?:s|ed)?)\b",
+    re.IGNORECASE
+)
+_PLACES_RE = re.compile(
+    r"\b(places?|visit(?:s|ed|ing)?|attractions?|tourists?|see(?:ing)?|go(?:es|ing)?|plan my trip)\b",
+    re.IGNORECASE
+)
+
+# Capitalized words that never start or continue a place name
+_NOT_PLACE_WORDS = (
+    "And|Or|But|Then|So|Also|Please|I|Me|My|We|Us|Our|You|Your|He|She|It|They|Them|"
+    "The|This|That|There|What|When|Where|How|Is|Are|Do|Can|"
+    "January|February|March|April|May|June|July|August|September|October|November|December|"
+    "Monday|Tuesday|Wednesday|Thursday|Friday|Saturday|Sunday"
+)
+_PLACE_WORD = rf"(?!(?:{_NOT_PLACE_WORDS})\b)[A-Z][\w'-]*"
+
+# Capitalized words following "in/to/visit/about", e.g. "go to New York"
+_PLACE_NAME_RE = re.compile(rf"\b(?:in|to|visit|about)\s+({_PLACE_WORD}(?:\s+{_PLACE_WORD})*)")
+
+# spaCy entity labels that denote places
+_PLACE_ENTITY_LABELS = {"GPE", "LOC", "FAC"}
+
+NO_PLACE_MESSAGE = "I couldn't identify a place name in your message. Please specify a location."
+UNKNOWN_PLACE_FALLBACK = "I don't know this place exists. Could you please check the spelling or provide more details about the location?"
+
+# LLM answers cached by normalized prompt input; demo and test queries repeat a lot
+_place_name_cache = LRUCache(maxsize=4096)
+_unknown_place_cache = LRUCache(maxsize=1024)
+_llm_cache_lock = threading.Lock()
+
+
+def _normalize(text: str) -> str:
+    """Normalize text for use as an LLM cache key"""
+    return " ".join(text.lower().split())
+
 
 class WeatherAgent:
     """
@@ -28,22 +80,24 @@ class WeatherAgent:
         self.nominatim = NominatimClient()  # Nominatim API for geocoding
         self.open_meteo = OpenMeteoClient()  # Open-Meteo API for weather
     
-    def get_weather_info(self, place_name: str) -> Optional[str]:
+    def get_weather_info(self, place_name: str, coords: Optional[Tuple[float, float]] = None) -> Optional[str]:
         """
         Get weather information for a place using Open-Meteo API.
         
         This method uses REAL API calls, NOT AI knowledge:
-        1. Nominatim API to get coordinates
+        1. Nominatim API to get coordinates (skipped if coords are given)
         2. Open-Meteo API to get weather data
         
         Args:
             place_name: Name of the place
+            coords: Already geocoded (latitude, longitude) of the place
             
         Returns:
             Formatted weather information string or None if place not found
         """
         # Step 1: Get coordinates using Nominatim API (NOT AI)
-        coords = self.nominatim.get_coordinates(place_name)
+        if coords is None:
+            coords = self.nominatim.get_coordinates(place_name)
         if not coords:
             return None
         
@@ -80,23 +134,27 @@ class PlacesAgent:
         self.nominatim = NominatimClient()  # Nominatim API for geocoding
         self.overpass = OverpassClient()  # Overpass API for tourist attractions
     
-    def get_places_info(self, place_name: str, limit: int = 5) -> Optional[str]:
+    def get_places_info(self, place_name: str, limit: int = 5,
+                        coords: Optional[Tuple[float, float]] = None) -> Optional[Tuple[str, str]]:
         """
         Get tourist attractions for a place using Overpass API.
         
         This method uses REAL API calls, NOT AI knowledge:
-        1. Nominatim API to get coordinates
+        1. Nominatim API to get coordinates (skipped if coords are given)
         2. Overpass API to get tourist attractions from OpenStreetMap
         
         Args:
             place_name: Name of the place
             limit: Maximum number of places to return
+            coords: Already geocoded (latitude, longitude) of the place
             
         Returns:
-            Formatted places information string or None if place not found
+            Tuple of (header line, newline-separated places list) or None if
+            place not found
         """
         # Step 1: Get coordinates using Nominatim API (NOT AI)
-        coords = self.nominatim.get_coordinates(place_name)
+        if coords is None:
+            coords = self.nominatim.get_coordinates(place_name)
         if not coords:
             return None
         
@@ -105,17 +163,21 @@ class PlacesAgent:
         # Step 2: Get tourist attractions using Overpass API (NOT AI)
         attractions = self.overpass.get_tourist_attractions(lat, lon, limit)
         
+        header = f"In {place_name} these are the places you can go, - - - - -"
+        
         if not attractions:
-            return f"In {place_name} these are the places you can go, - - - - -\n(No tourist attractions found in the database)"
+            return (header, "(No tourist attractions found in the database)")
         
         # Format the real API data
-        places_list = "\n".join([f"{place['name']}" for place in attractions])
-        return f"In {place_name} these are the places you can go, - - - - -\n{places_list}"
+        return (header, "\n".join(place["name"] for place in attractions))
 
 
 class TourismAIAgent:
     """Parent Agent: Orchestrates the tourism system"""
     
+    # Number of user inputs sent per batched place-extraction call
+    EXTRACT_BATCH_SIZE = 16
+    
     def __init__(self):
         self.weather_agent = WeatherAgent()
         self.places_agent = PlacesAgent()
@@ -124,10 +186,62 @@ class TourismAIAgent:
             raise ValueError("OPENAI_API_KEY not found in environment variables")
         self.client = OpenAI(api_key=api_key)
         self.nominatim = NominatimClient()
+        self.nlp = self._load_nlp()
+        # Places lookups run here while the request thread fetches the weather
+        self._executor = ThreadPoolExecutor(max_workers=WORKER_THREADS, thread_name_prefix="child-agent")
+    
+    @staticmethod
+    def _load_nlp():
+        """Load the spaCy English model if available, otherwise return None"""
+        if spacy is None:
+            return None
+        try:
+            return spacy.load("en_core_web_sm")
+        except OSError:
+            logger.info("spaCy model 'en_core_web_sm' not found, using the LLM for place extraction")
+            return None
+    
+    def _extract_place_name_locally(self, user_input: str) -> Optional[str]:
+        """
+        Extract place name without calling the LLM.
+        
+        Uses spaCy named entities when the model is installed, otherwise a
+        regex over capitalized words after "in", "to", "visit" or "about".
+        
+        Args:
+            user_input: User's input text
+            
+        Returns:
+            Extracted place name or None if nothing was recognized
+        """
+        if self.nlp is not None:
+            doc = self.nlp(user_input)
+            for ent in doc.ents:
+                if ent.label_ in _PLACE_ENTITY_LABELS:
+                    return ent.text
+            return None
+        
+        match = _PLACE_NAME_RE.search(user_input)
+        return match.group(1) if match else None
     
     def extract_place_name(self, user_input: str) -> Optional[str]:
         """
-        Extract place name from user input using LLM.
+        Extract place name from user input.
+        
+        Same rules as process_query: a local guess is kept only if the
+        place exists, otherwise the LLM is asked.
+        
+        Args:
+            user_input: User's input text
+            
+        Returns:
+            Extracted place name or None
+        """
+        return self._resolve_place(user_input)[0]
+    
+    def _extract_place_name_llm(self, user_input: str) -> Optional[str]:
+        """
+        Extract place name from user input with the LLM, caching the answer.
         
         Args:
             user_input: User's input text
@@ -135,6 +249,11 @@ class TourismAIAgent:
         Returns:
             Extracted place name or None
         """
+        cache_key = _normalize(user_input)
+        with _llm_cache_lock:
+            if cache_key in _place_name_cache:
+                return _place_name_cache[cache_key]
+        
         try:
             response = self.client.chat.completions.create(
                 model="gpt-3.5-turbo",
@@ -142,18 +261,102 @@ class TourismAIAgent:
                     {"role": "system", "content": "You are a helpful assistant that extracts place names from user input. Return only the place name, nothing else. If no place is mentioned, return 'NONE'."},
                     {"role": "user", "content": f"Extract the place name from: {user_input}"}
                 ],
-                temperature=0.7,
+                temperature=0,
                 max_tokens=50
             )
             place_name = response.choices[0].message.content.strip()
             
             if place_name.upper() == "NONE" or not place_name:
-                return None
+                place_name = None
+            
+            with _llm_cache_lock:
+                _place_name_cache[cache_key] = place_name
             return place_name
         except Exception as e:
-            print(f"Error extracting place name: {e}")
+            logger.warning("Extracting place name failed: %s", e)
             return None
     
+    def extract_place_names(self, inputs: List[str]) -> List[Optional[str]]:
+        """
+        Extract place names from many user inputs at once.
+        
+        Meant for bulk/offline use. Inputs whose local guess is a verified
+        place, or whose answer is already cached, are skipped; the rest are
+        sent to the LLM in groups of EXTRACT_BATCH_SIZE, so the system prompt
+        is paid once per group instead of once per input. As in
+        process_query, an unverified local guess is only returned when the
+        LLM finds no place either.
+        
+        Args:
+            inputs: List of user input texts
+            
+        Returns:
+            List of extracted place names (or None), in input order
+        """
+        local_names = [self._extract_place_name_locally(text) for text in inputs]
+        verified = list(self._executor.map(
+            lambda name: bool(name) and self.nominatim.verify_place_exists(name, strict=True)[0],
+            local_names
+        ))
+        results = [name if ok else None for name, ok in zip(local_names, verified)]
+        
+        pending = []
+        with _llm_cache_lock:
+            for i, text in enumerate(inputs):
+                if verified[i]:
+                    continue
+                cache_key = _normalize(text)
+                if cache_key in _place_name_cache:
+                    results[i] = _place_name_cache[cache_key]
+                else:
+                    pending.append(i)
+        
+        for start in range(0, len(pending), self.EXTRACT_BATCH_SIZE):
+            batch = pending[start:start + self.EXTRACT_BATCH_SIZE]
+            names = self._extract_place_names_batch([inputs[i] for i in batch])
+            for i, name in zip(batch, names):
+                results[i] = name
+        
+        # Fall back to the unverified local guess when the LLM found nothing
+        return [result or local for result, local in zip(results, local_names)]
+    
+    def _extract_place_names_batch(self, texts: List[str]) -> List[Optional[str]]:
+        """
+        Ask the LLM for the place names of several inputs in one call.
+        
+        Args:
+            texts: User input texts (at most EXTRACT_BATCH_SIZE)
+            
+        Returns:
+            List of extracted place names (or None), in input order
+        """
+        try:
+            response = self.client.chat.completions.create(
+                model="gpt-4o-mini",
+                messages=[
+                    {"role": "system", "content": "You extract place names from user inputs. The user sends a JSON array of objects with an index 'i' and a 'text'. Return a JSON object {\"places\": [...]} holding one place name (or null if no place is mentioned) per input, in the same order as the inputs."},
+                    {"role": "user", "content": orjson.dumps([{"i": i, "text": text} for i, text in enumerate(texts)]).decode()}
+                ],
+                response_format={"type": "json_object"},
+                temperature=0
+            )
+            places = orjson.loads(response.choices[0].message.content).get("places")
+            if not isinstance(places, list) or len(places) != len(texts):
+                raise ValueError(f"expected {len(texts)} place names, got {places!r}")
+        except Exception as e:
+            logger.warning("Extracting place names failed: %s", e)
+            return [None] * len(texts)
+        
+        results = []
+        with _llm_cache_lock:
+            for text, place in zip(texts, places):
+                place_name = place.strip() if isinstance(place, str) else None
+                if not place_name or place_name.upper() == "NONE":
+                    place_name = None
+                _place_name_cache[_normalize(text)] = place_name
+                results.append(place_name)
+        return results
+    
     def determine_intent(self, user_input: str) -> Dict[str, bool]:
         """
         Determine what the user is asking for.
@@ -164,13 +367,8 @@ class TourismAIAgent:
         Returns:
             Dictionary with flags for weather and places
         """
-        user_lower = user_input.lower()
-        
-        weather_keywords = ["temperature", "weather", "rain", "temperature there", "hot", "cold", "forecast"]
-        places_keywords = ["places", "visit", "attractions", "tourist", "see", "go", "plan my trip"]
-        
-        needs_weather = any(keyword in user_lower for keyword in weather_keywords)
-        needs_places = any(keyword in user_lower for keyword in places_keywords)
+        needs_weather = bool(_WEATHER_RE.search(user_input))
+        needs_places = bool(_PLACES_RE.search(user_input))
         
         # If no specific intent, default to places
         if not needs_weather and not needs_places:
@@ -181,6 +379,167 @@ class TourismAIAgent:
             "places": needs_places
         }
     
+    @staticmethod
+    def _unknown_place_messages(place_name: str) -> List[Dict[str, str]]:
+        """Build the chat messages asking for an "unknown place" response"""
+        prompt = f"""The user asked about a place called "{place_name}", but this place doesn't exist in the database. 
+            Respond naturally and politely that you don't know this place exists. 
+            Keep it brief and friendly, similar to: "I don't know this place exists."
+            
+            Your response:"""
+        
+        return [
+            {"role": "system", "content": "You are a helpful tourism assistant. When a place doesn't exist, respond naturally and politely."},
+            {"role": "user", "content": prompt}
+        ]
+    
+    def unknown_place_response(self, place_name: str) -> str:
+        """
+        Generate a natural response for a place that doesn't exist.
+        
+        Args:
+            place_name: The place name that couldn't be verified
+            
+        Returns:
+            Polite "I don't know this place exists" message
+        """
+        cache_key = place_name.lower()
+        with _llm_cache_lock:
+            if cache_key in _unknown_place_cache:
+                return _unknown_place_cache[cache_key]
+        
+        # Use AI to generate a natural response
+        try:
+            response = self.client.chat.completions.create(
+                model="gpt-3.5-turbo",
+                messages=self._unknown_place_messages(place_name),
+                temperature=0,
+                max_tokens=50
+            )
+            message = response.choices[0].message.content.strip()
+        except Exception as e:
+            logger.warning("Generating unknown place response failed: %s", e)
+            # Fallback to simple message if AI fails
+            return UNKNOWN_PLACE_FALLBACK
+        
+        with _llm_cache_lock:
+            _unknown_place_cache[cache_key] = message
+        return message
+    
+    def stream_unknown_place_response(self, place_name: str) -> Iterator[str]:
+        """
+        Stream the "unknown place" response token by token as it is generated.
+        
+        Args:
+            place_name: The place name that couldn't be verified
+            
+        Yields:
+            Pieces of the response text
+        """
+        cache_key = place_name.lower()
+        with _llm_cache_lock:
+            cached = _unknown_place_cache.get(cache_key)
+        if cached is not None:
+            yield cached
+            return
+        
+        pieces = []
+        try:
+            stream = self.client.chat.completions.create(
+                model="gpt-3.5-turbo",
+                messages=self._unknown_place_messages(place_name),
+                temperature=0,
+                max_tokens=50,
+                stream=True
+            )
+            for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if not delta:
+                    continue
+                if not pieces:
+                    delta = delta.lstrip()
+                    if not delta:
+                        continue
+                pieces.append(delta)
+                yield delta
+        except Exception as e:
+            logger.warning("Streaming unknown place response failed: %s", e)
+            # Fallback to simple message if AI fails before saying anything
+            if not pieces:
+                yield UNKNOWN_PLACE_FALLBACK
+            return
+        
+        message = "".join(pieces).strip()
+        if message:
+            with _llm_cache_lock:
+                _unknown_place_cache[cache_key] = message
+    
+    @staticmethod
+    def _result_or_none(future: Optional[Future], agent_name: str) -> Any:
+        """
+        Wait for a child agent's result, treating failures as missing data.
+        
+        Args:
+            future: Pending child agent call, or None if it was not requested
+            agent_name: Agent name used in the error message
+            
+        Returns:
+            The child agent's response or None
+        """
+        if future is None:
+            return None
+        try:
+            return future.result()
+        except Exception:
+            logger.exception("%s agent error", agent_name)
+            return None
+    
+    @staticmethod
+    def _run_or_none(func: Callable[..., Any], agent_name: str, *args, **kwargs) -> Any:
+        """
+        Call a child agent in this thread, treating failures as missing data.
+        
+        Args:
+            func: Child agent method to call
+            agent_name: Agent name used in the error message
+            *args, **kwargs: Arguments for func
+            
+        Returns:
+            The child agent's response or None
+        """
+        try:
+            return func(*args, **kwargs)
+        except Exception:
+            logger.exception("%s agent error", agent_name)
+            return None
+    
+    def _resolve_place(self, user_input: str) -> Tuple[Optional[str], bool, Optional[Dict]]:
+        """
+        Extract the place name and verify it exists.
+        
+        A locally extracted name that fails verification (e.g. "Plan" from
+        "I'd like to Plan my trip to Rome") falls back to the LLM extraction.
+        
+        Args:
+            user_input: User's input text
+            
+        Returns:
+            Tuple of (place_name, exists, place_details); place_name is None
+            if no place was mentioned
+        """
+        local_name = self._extract_place_name_locally(user_input)
+        if local_name:
+            exists, place_details, _ = self.nominatim.verify_place_exists(local_name, strict=True)
+            if exists:
+                return local_name, True, place_details
+        
+        place_name = self._extract_place_name_llm(user_input)
+        if not place_name or place_name == local_name:
+            return local_name, False, None
+        
+        exists, place_details, _ = self.nominatim.verify_place_exists(place_name, strict=True)
+        return place_name, exists, place_details
+    
     def process_query(self, user_input: str) -> str:
         """
         Process user query and return response.
@@ -191,77 +550,85 @@ class TourismAIAgent:
         Returns:
             Formatted response string
         """
-        # Extract place name
-        place_name = self.extract_place_name(user_input)
+        # Extract place name and verify it exists with strict checking
+        place_name, exists, place_details = self._resolve_place(user_input)
         
         if not place_name:
-            return "I couldn't identify a place name in your message. Please specify a location."
+            return NO_PLACE_MESSAGE
         
-        # Verify place exists with strict checking
-        exists, place_details, _ = self.nominatim.verify_place_exists(place_name, strict=True)
         if not exists:
-            # Use AI to generate a natural response
-            try:
-                prompt = f"""The user asked about a place called "{place_name}", but this place doesn't exist in the database. 
-                Respond naturally and politely that you don't know this place exists. 
-                Keep it brief and friendly, similar to: "I don't know this place exists."
-                
-                Your response:"""
-                
-                response = self.client.chat.completions.create(
-                    model="gpt-3.5-turbo",
-                    messages=[
-                        {"role": "system", "content": "You are a helpful tourism assistant. When a place doesn't exist, respond naturally and politely."},
-                        {"role": "user", "content": prompt}
-                    ],
-                    temperature=0.7,
-                    max_tokens=50
-                )
-                return response.choices[0].message.content.strip()
-            except Exception as e:
-                # Fallback to simple message if AI fails
-                return f"I don't know this place exists. Could you please check the spelling or provide more details about the location?"
+            return self.unknown_place_response(place_name)
+        
+        return "".join(self._place_info_pieces(user_input, place_name, place_details))
+    
+    def process_query_stream(self, user_input: str) -> Iterator[str]:
+        """
+        Process user query, yielding the response in pieces as soon as each
+        is ready (LLM tokens, then the weather and places sections).
+        
+        Args:
+            user_input: User's input text
+            
+        Yields:
+            Pieces of the response text
+        """
+        place_name, exists, place_details = self._resolve_place(user_input)
+        
+        if not place_name:
+            yield NO_PLACE_MESSAGE
+            return
+        
+        if not exists:
+            yield from self.stream_unknown_place_response(place_name)
+            return
+        
+        yield from self._place_info_pieces(user_input, place_name, place_details)
+    
+    def _place_info_pieces(self, user_input: str, place_name: str, place_details: Dict) -> Iterator[str]:
+        """
+        Gather weather and places information for a verified place.
+        
+        Args:
+            user_input: User's input text
+            place_name: Extracted place name
+            place_details: Verified place details from Nominatim
+            
+        Yields:
+            Response sections, in order; joined they form the full response
+        """
+        # Reuse the verified coordinates so the child agents don't geocode again
+        coords = (place_details["lat"], place_details["lon"])
         
         # Determine intent
         intent = self.determine_intent(user_input)
         
-        # Get information from child agents
-        weather_info = None
-        places_info = None
-        
-        if intent["weather"]:
-            try:
-                weather_info = self.weather_agent.get_weather_info(place_name)
-            except Exception as e:
-                print(f"Weather agent error: {e}")
-                weather_info = None
-        
-        if intent["places"]:
-            try:
-                places_info = self.places_agent.get_places_info(place_name)
-            except Exception as e:
-                print(f"Places agent error: {e}")
-                places_info = None
+        # Get information from child agents concurrently - the weather and
+        # places lookups are independent network calls. The places lookup
+        # goes to the pool only when the weather is fetched alongside it in
+        # this thread.
+        places_future = None
+        if intent["places"] and intent["weather"]:
+            places_future = self._executor.submit(self.places_agent.get_places_info, place_name, coords=coords)
         
         # Combine responses
-        response_parts = []
-        
+        weather_info = None
+        if intent["weather"]:
+            weather_info = self._run_or_none(self.weather_agent.get_weather_info, "Weather", place_name, coords)
         if weather_info:
-            response_parts.append(weather_info)
+            yield weather_info
         
+        if places_future is not None:
+            places_info = self._result_or_none(places_future, "Places")
+        elif intent["places"]:
+            places_info = self._run_or_none(self.places_agent.get_places_info, "Places", place_name, coords=coords)
+        else:
+            places_info = None
         if places_info:
+            header, places_list = places_info
             if weather_info:
-                # Extract just the places list from places_info
-                if "\n" in places_info:
-                    places_list = places_info.split("\n", 1)[1]  # Get everything after first line
-                    response_parts.append(f"And these are the places you can go: - - - - -\n{places_list}")
-                else:
-                    response_parts.append(f"And {places_info}")
+                yield f" And these are the places you can go: - - - - -\n{places_list}"
             else:
-                response_parts.append(places_info)
+                yield f"{header}\n{places_list}"
         
-        if not response_parts:
-            return f"I found {place_name}, but couldn't retrieve information. Please try again."
-        
-        return " ".join(response_parts)
-
+        if not weather_info and not places_info:
+            yield f"I found {place_name}, but couldn't retrieve information. Please try again."
@@ -2,10 +2,158 @@
 API clients for external services: Nominatim, Open-Meteo, and Overpass
 """
 import requests
-from typing import Optional, Dict, List, Tuple
+import ijson
+import openmeteo_requests
+import orjson
+from cachetools import TTLCache
+from disk_cache import SQLiteCache
+from openmeteo_sdk.Unit import Unit
+from rapidfuzz import fuzz, utils
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import Any, Optional, Dict, Iterator, List, Tuple
+import logging
+import math
+import os
+import threading
 import time
 
 
+logger = logging.getLogger(__name__)
+
+# Sentinel so cached "not found" (None) results can be told apart from misses
+_MISSING = object()
+_cache_lock = threading.Lock()
+
+
+def _cache_get(cache: TTLCache, key) -> Any:
+    """Thread-safe cache lookup returning _MISSING on a miss"""
+    with _cache_lock:
+        return cache.get(key, _MISSING)
+
+
+def _cache_set(cache: TTLCache, key, value) -> None:
+    """Thread-safe cache store"""
+    with _cache_lock:
+        cache[key] = value
+
+
+def create_session(pool_connections: int = 16, pool_maxsize: int = 64) -> requests.Session:
+    """
+    Create an HTTP session with connection pooling and retries.
+    
+    Reusing connections skips the TCP/TLS handshake on every call, and
+    transient errors (including 429 throttling from Nominatim and Overpass)
+    are retried with exponential backoff.
+    
+    Args:
+        pool_connections: Number of hosts to keep connection pools for
+        pool_maxsize: Connections kept per host, at least the number of
+            threads calling it concurrently
+    
+    Returns:
+        Configured requests.Session
+    """
+    retry = Retry(
+        total=3,
+        backoff_factor=0.3,
+        status_forcelist=[429, 500, 502, 503, 504],
+        # Overpass queries and translations are sent as POST but are read-only
+        allowed_methods=frozenset({"GET", "POST"})
+    )
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=retry)
+    
+    session = requests.Session()
+    session.headers.update({"User-Agent": "Tourism-AI-Agent/1.0"})
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+# Size of the background thread pools (places lookups, streamed
+# translation); keep it equal to gunicorn's --threads so every request
+# thread can have one job pending
+WORKER_THREADS = int(os.getenv("WORKER_THREADS", 32))
+
+# One pooled session shared by every client instance, so the agents, the
+# offline system and the web app all reuse the same warm connections; both
+# the request threads and the pooled lookups call the same hosts
+_shared_session = create_session(pool_maxsize=2 * WORKER_THREADS)
+
+# Bundled coordinates of well-known cities, one JSON object per line:
+# {"name", "country", "lat", "lon", "aliases"?}. Matches skip Nominatim
+# entirely, so names shared by other notable places ("Washington",
+# "Hyderabad") are left out or listed only in their qualified form
+KNOWN_CITIES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "cities.jsonl")
+
+
+def _normalize_place(place_name: str) -> str:
+    """Normalize a place name for lookups (case and whitespace insensitive)"""
+    return " ".join(place_name.casefold().split())
+
+
+def load_known_cities(path: str = KNOWN_CITIES_PATH) -> Dict[str, Dict]:
+    """
+    Load the bundled city list into a lookup table.
+    
+    Args:
+        path: Path to the JSON Lines city file
+        
+    Returns:
+        Dictionary mapping normalized city names and aliases to city entries
+    """
+    cities = {}
+    try:
+        with open(path, "rb") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                city = orjson.loads(line)
+                for name in [city["name"], *city.get("aliases", [])]:
+                    cities[_normalize_place(name)] = city
+    except OSError as e:
+        logger.warning("Known cities list not loaded: %s", e)
+    return cities
+
+
+KNOWN_CITIES = load_known_cities()
+
+# On-disk geocoding cache shared across restarts
+GEOCODE_CACHE_PATH = os.getenv(
+    "GEOCODE_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "geocode_cache.db")
+)
+
+
+def _iter_overpass_elements(stream, meta: Dict) -> Iterator[Dict]:
+    """
+    Incrementally yield the elements of an Overpass JSON response.
+    
+    Overpass puts a top-level "remark" after the elements when a query hits
+    a runtime error (timeout, size limit); if the stream is read that far it
+    is stored in meta["remark"].
+    
+    Args:
+        stream: File-like object with the JSON response body
+        meta: Dictionary that receives the remark, if any
+        
+    Yields:
+        Element dictionaries
+    """
+    builder = None
+    for prefix, event, value in ijson.parse(stream):
+        if builder is not None:
+            builder.event(event, value)
+            if prefix == "elements.item" and event == "end_map":
+                yield builder.value
+                builder = None
+        elif prefix == "elements.item" and event == "start_map":
+            builder = ijson.ObjectBuilder()
+            builder.event(event, value)
+        elif prefix == "remark":
+            meta["remark"] = value
+
+
 class NominatimClient:
     """
     Client for Nominatim API (geocoding)
@@ -19,6 +167,34 @@ class NominatimClient:
     
     BASE_URL = "https://nominatim.openstreetmap.org/search"
     
+    # Geocoding results practically never change, keep them for 30 days:
+    # in memory first, then on disk so restarts don't lose them
+    GEO_TTL = 30 * 24 * 3600
+    _geo_cache = TTLCache(maxsize=10_000, ttl=GEO_TTL)
+    _geo_store = SQLiteCache(GEOCODE_CACHE_PATH, table="geocode", ttl=GEO_TTL)
+    
+    def __init__(self, session: Optional[requests.Session] = None):
+        self.session = session or _shared_session
+    
+    def _cache_lookup(self, cache_key: Tuple) -> Any:
+        """Look up a geocoding result in memory, then on disk"""
+        cached = _cache_get(self._geo_cache, cache_key)
+        if cached is _MISSING:
+            blob = self._geo_store.get(repr(cache_key))
+            if blob is not None:
+                cached = orjson.loads(blob)
+                _cache_set(self._geo_cache, cache_key, cached)
+        return cached
+    
+    def _cache_store(self, cache_key: Tuple, value: Any) -> None:
+        """
+        Store a geocoding result in memory and, unless it is a "not found"
+        result, on disk (so typos and junk input don't pile up in the file).
+        """
+        _cache_set(self._geo_cache, cache_key, value)
+        if value is not None:
+            self._geo_store.set(repr(cache_key), orjson.dumps(value))
+    
     def get_coordinates(self, place_name: str) -> Optional[Tuple[float, float]]:
         """
         Get latitude and longitude for a place name.
@@ -29,67 +205,84 @@ class NominatimClient:
         Returns:
             Tuple of (latitude, longitude) or None if not found
         """
+        city = KNOWN_CITIES.get(_normalize_place(place_name))
+        if city:
+            return (city["lat"], city["lon"])
+        
+        cache_key = ("coords", _normalize_place(place_name))
+        cached = self._cache_lookup(cache_key)
+        if cached is not _MISSING:
+            return tuple(cached) if cached else None
+        
         params = {
             "q": place_name,
             "format": "json",
             "limit": 1
         }
         
-        headers = {
-            "User-Agent": "Tourism-AI-Agent/1.0"
-        }
-        
         try:
-            response = requests.get(self.BASE_URL, params=params, headers=headers, timeout=10)
+            response = self.session.get(self.BASE_URL, params=params, timeout=10)
             response.raise_for_status()
-            data = response.json()
+            data = orjson.loads(response.content)
             
+            coords = None
             if data and len(data) > 0:
                 lat = float(data[0]["lat"])
                 lon = float(data[0]["lon"])
-                return (lat, lon)
-            return None
+                coords = (lat, lon)
+            self._cache_store(cache_key, coords)
+            return coords
         except Exception as e:
-            print(f"Error fetching coordinates: {e}")
+            logger.warning("Fetching coordinates failed: %s", e)
             return None
     
-    def get_place_details(self, place_name: str) -> Optional[Dict]:
+    def get_place_details(self, place_name: str, with_address: bool = False) -> Optional[Dict]:
         """
         Get detailed information about a place including name, type, and country.
         
+        Address breakdown is expensive for Nominatim and inflates the response,
+        so by default only the country is derived from the display name (its
+        last component) and state/city are left empty.
+        
         Args:
             place_name: Name of the place
+            with_address: If True, request addressdetails for state and city
             
         Returns:
             Dictionary with place details or None if not found
         """
+        cache_key = ("details", _normalize_place(place_name), with_address)
+        cached = self._cache_lookup(cache_key)
+        if cached is not _MISSING:
+            return cached
+        
         params = {
             "q": place_name,
             "format": "json",
-            "limit": 1,
-            "addressdetails": 1
-        }
-        
-        headers = {
-            "User-Agent": "Tourism-AI-Agent/1.0"
+            "limit": 1
         }
+        if with_address:
+            params["addressdetails"] = 1
         
         try:
-            response = requests.get(self.BASE_URL, params=params, headers=headers, timeout=10)
+            response = self.session.get(self.BASE_URL, params=params, timeout=10)
             response.raise_for_status()
-            data = response.json()
+            data = orjson.loads(response.content)
             
+            place_details = None
             if data and len(data) > 0:
                 result = data[0]
+                display_name = result.get("display_name", place_name)
+                address = result.get("address", {})
                 place_details = {
                     "name": result.get("name", place_name),
-                    "display_name": result.get("display_name", place_name),
+                    "display_name": display_name,
                     "type": result.get("type", "unknown"),
                     "lat": float(result.get("lat", 0)),
                     "lon": float(result.get("lon", 0)),
-                    "country": result.get("address", {}).get("country", "Unknown"),
-                    "state": result.get("address", {}).get("state", ""),
-                    "city": result.get("address", {}).get("city", ""),
+                    "country": address.get("country") or display_name.rsplit(",", 1)[-1].strip() or "Unknown",
+                    "state": address.get("state", ""),
+                    "city": address.get("city", ""),
                     "importance": result.get("importance", 0),
                     "osm_type": result.get("osm_type", "")
                 }
@@ -98,22 +291,39 @@ class NominatimClient:
                 found_name = place_details["name"].lower()
                 search_term = place_name.lower().strip()
                 
-                # Calculate match confidence
-                # Exact match or contains the search term
-                if found_name == search_term or search_term in found_name:
+                # Calculate match confidence from a 0-100 fuzzy score; token set
+                # matching treats "Valhalla" and "Valhalla, NY" as a full match
+                score = fuzz.token_set_ratio(found_name, search_term, processor=utils.default_process)
+                if score >= 90:
                     place_details["match_confidence"] = "high"
-                # Partial match (e.g., "Valhalla" matches "Valhalla, NY")
-                elif any(word in found_name for word in search_term.split()):
+                elif score >= 60:
                     place_details["match_confidence"] = "medium"
                 else:
                     place_details["match_confidence"] = "low"
-                
-                return place_details
-            return None
+            
+            self._cache_store(cache_key, place_details)
+            return place_details
         except Exception as e:
-            print(f"Error fetching place details: {e}")
+            logger.warning("Fetching place details failed: %s", e)
             return None
     
+    @staticmethod
+    def _known_city_details(city: Dict) -> Dict:
+        """Build place details in get_place_details format for a bundled city"""
+        return {
+            "name": city["name"],
+            "display_name": f"{city['name']}, {city['country']}",
+            "type": "city",
+            "lat": city["lat"],
+            "lon": city["lon"],
+            "country": city["country"],
+            "state": "",
+            "city": city["name"],
+            "importance": 1.0,
+            "osm_type": "",
+            "match_confidence": "high"
+        }
+    
     def verify_place_exists(self, place_name: str, strict: bool = True) -> Tuple[bool, Optional[Dict], str]:
         """
         Verify if a place exists with confidence checking.
@@ -125,7 +335,13 @@ class NominatimClient:
         Returns:
             Tuple of (exists, place_details, message)
         """
-        place_details = self.get_place_details(place_name)
+        # Well-known cities are answered from the bundled list without an API call
+        city = KNOWN_CITIES.get(_normalize_place(place_name))
+        if city:
+            place_details = self._known_city_details(city)
+            return (True, place_details, f"Found {place_details['display_name']}")
+        
+        place_details = self.get_place_details(place_name, with_address=False)
         
         if not place_details:
             return (False, None, "I don't know this place exists.")
@@ -158,10 +374,27 @@ class OpenMeteoClient:
     
     This client fetches REAL weather data from Open-Meteo API.
     It does NOT use AI knowledge.
+    
+    Responses are requested in Open-Meteo's FlatBuffers format through the
+    official openmeteo-requests SDK, which is smaller on the wire and
+    decoded without JSON parsing.
     """
     
     BASE_URL = "https://api.open-meteo.com/v1/forecast"
     
+    # Variables requested under "current"; the SDK returns them in this order
+    CURRENT_VARIABLES = ["temperature_2m", "precipitation_probability"]
+    
+    # Open-Meteo refreshes current conditions roughly every 10 minutes
+    _wx_cache = TTLCache(maxsize=10_000, ttl=600)
+    
+    def __init__(self, session: Optional[requests.Session] = None):
+        self.session = session or _shared_session
+        # openmeteo-requests 1.5+ is typed for niquests sessions but only calls
+        # session.get(url, params=..., **kwargs), which requests.Session
+        # supports; timeout= is forwarded from 1.4.0 on
+        self.client = openmeteo_requests.Client(session=self.session)
+    
     def get_weather(self, latitude: float, longitude: float) -> Optional[Dict]:
         """
         Get current weather and forecast for given coordinates.
@@ -173,28 +406,74 @@ class OpenMeteoClient:
         Returns:
             Dictionary with weather data or None if error
         """
-        params = {
-            "latitude": latitude,
-            "longitude": longitude,
-            "current": "temperature_2m,precipitation_probability",
-            "forecast_days": 1
-        }
+        return self.get_weather_many([(latitude, longitude)])[0]
+    
+    def get_weather_many(self, coords: List[Tuple[float, float]]) -> List[Optional[Dict]]:
+        """
+        Get current weather for several locations with a single API call.
         
-        try:
-            response = requests.get(self.BASE_URL, params=params, timeout=10)
-            response.raise_for_status()
-            data = response.json()
+        Open-Meteo accepts comma-separated latitude/longitude lists and
+        returns one response per location, in request order.
+        
+        Args:
+            coords: List of (latitude, longitude) tuples
             
-            if "current" in data:
-                return {
-                    "temperature": data["current"].get("temperature_2m"),
-                    "precipitation_probability": data["current"].get("precipitation_probability"),
-                    "unit": data["current_units"].get("temperature_2m", "°C")
-                }
-            return None
-        except Exception as e:
-            print(f"Error fetching weather: {e}")
+        Returns:
+            List of weather dictionaries (or None on error), one per location
+        """
+        # Nearby coordinates (~100 m) share a cache entry
+        cache_keys = [(round(lat, 3), round(lon, 3)) for lat, lon in coords]
+        results = [_cache_get(self._wx_cache, key) for key in cache_keys]
+        missing = [i for i, result in enumerate(results) if result is _MISSING]
+        
+        if missing:
+            params = {
+                "latitude": ",".join(str(coords[i][0]) for i in missing),
+                "longitude": ",".join(str(coords[i][1]) for i in missing),
+                "current": self.CURRENT_VARIABLES,
+                "forecast_days": 1
+            }
+            
+            try:
+                responses = self.client.weather_api(self.BASE_URL, params=params, timeout=10)
+                
+            except Exception as e:
+                logger.warning("Fetching weather failed: %s", e)
+                responses = []
+            
+            # One malformed response shouldn't discard the rest of the batch
+            for i, response in zip(missing, responses):
+                try:
+                    weather = self._parse_current(response)
+                except Exception as e:
+                    logger.warning("Parsing weather for %s failed: %s", coords[i], e)
+                    continue
+                _cache_set(self._wx_cache, cache_keys[i], weather)
+                results[i] = weather
+        
+        return [None if result is _MISSING else result for result in results]
+    
+    @staticmethod
+    def _parse_current(response) -> Optional[Dict]:
+        """Read the current variables out of one FlatBuffers weather response"""
+        current = response.Current()
+        if current is None:
             return None
+        
+        temperature = current.Variables(0)
+        precipitation = current.Variables(1)
+        return {
+            "temperature": _round_or_none(temperature.Value(), 1),
+            "precipitation_probability": _round_or_none(precipitation.Value()),
+            "unit": "°F" if temperature.Unit() == Unit.fahrenheit else "°C"
+        }
+
+
+def _round_or_none(value: float, ndigits: Optional[int] = None) -> Optional[float]:
+    """Round an SDK value; missing variables come back as NaN and map to None"""
+    if value is None or math.isnan(value):
+        return None
+    return round(value, ndigits)
 
 
 class OverpassClient:
@@ -210,6 +489,16 @@ class OverpassClient:
     
     BASE_URL = "https://overpass-api.de/api/interpreter"
     
+    # Search radii in meters; the smaller one is a fallback when Overpass
+    # times out or hits its size limit on the larger area
+    SEARCH_RADII = (10000, 5000)
+    
+    # OpenStreetMap attractions change rarely, keep them for a day
+    _osm_cache = TTLCache(maxsize=10_000, ttl=24 * 3600)
+    
+    def __init__(self, session: Optional[requests.Session] = None):
+        self.session = session or _shared_session
+    
     def get_tourist_attractions(self, latitude: float, longitude: float, limit: int = 5) -> List[Dict]:
         """
         Get tourist attractions near given coordinates.
@@ -222,52 +511,98 @@ class OverpassClient:
         Returns:
             List of dictionaries with place information
         """
-        # Overpass QL query to find tourist attractions within 10km radius
-        query = f"""[out:json][timeout:25];
+        cache_key = (round(latitude, 3), round(longitude, 3), limit)
+        cached = _cache_get(self._osm_cache, cache_key)
+        if cached is not _MISSING:
+            return list(cached)
+        
+        places = []
+        for radius in self.SEARCH_RADII:
+            try:
+                found, remark = self._query_attractions(latitude, longitude, limit, radius)
+            except Exception as e:
+                logger.warning("Fetching tourist attractions failed: %s", e)
+                return list(places)
+            
+            # Overpass reports timeouts and oversized results as a "runtime
+            # error" remark next to whatever it managed to return
+            if not remark or "runtime error" not in remark:
+                _cache_set(self._osm_cache, cache_key, found)
+                return list(found)
+            
+            logger.warning("Overpass query within %d m failed: %s", radius, remark)
+            # Keep the larger partial result across radii
+            if len(found) > len(places):
+                places = found
+            if len(places) >= limit:
+                break
+        
+        return list(places)
+    
+    def _query_attractions(self, latitude: float, longitude: float, limit: int,
+                           radius: int) -> Tuple[List[Dict], Optional[str]]:
+        """
+        Run one Overpass query for named tourist attractions.
+        
+        Args:
+            latitude: Latitude of the location
+            longitude: Longitude of the location
+            limit: Maximum number of places to return
+            radius: Search radius in meters
+            
+        Returns:
+            Tuple of (places, Overpass remark or None)
+        """
+        # Overpass QL query to find named tourist attractions within the radius.
+        # Only tags are needed (no geometry) and the result count is capped on
+        # the server, with some headroom since a node and a way often share a name.
+        # Server time is bounded so dense cities can't stall us; the response
+        # size is already bounded by the out count.
+        query = f"""[out:json][timeout:10];
         (
-          node["tourism"](around:10000,{latitude},{longitude});
-          way["tourism"](around:10000,{latitude},{longitude});
+          node["tourism"]["name"](around:{radius},{latitude},{longitude});
+          way["tourism"]["name"](around:{radius},{latitude},{longitude});
         );
-        out body;
-        >;
-        out skel qt;"""
+        out tags {limit * 2};"""
         
-        try:
-            response = requests.post(
-                self.BASE_URL,
-                data={"data": query},
-                headers={"Content-Type": "application/x-www-form-urlencoded"},
-                timeout=30
-            )
+        places = []
+        seen_names = set()
+        meta = {}
+        
+        # Stream-parse the elements so parsing stops as soon as enough
+        # places are found instead of building the whole document first
+        with self.session.post(
+            self.BASE_URL,
+            data={"data": query},
+            timeout=15,
+            stream=True
+        ) as response:
             response.raise_for_status()
-            data = response.json()
+            response.raw.decode_content = True
             
-            places = []
-            seen_names = set()
+            # Bound methods hoisted out of the per-element loop
+            append = places.append
+            add_name = seen_names.add
             
-            for element in data.get("elements", []):
-                tags = element.get("tags", {})
-                if not tags:
-                    continue
+            for element in _iter_overpass_elements(response.raw, meta):
+                tags = element.get("tags")
                 
                 # Check if it's a tourism-related element
-                if "tourism" not in tags:
+                if not tags or "tourism" not in tags:
                     continue
                 
                 name = tags.get("name") or tags.get("name:en") or tags.get("name:en-GB")
+                if not name or name in seen_names:
+                    continue
                 
-                if name and name not in seen_names:
-                    places.append({
-                        "name": name,
-                        "type": tags.get("tourism", "attraction")
-                    })
-                    seen_names.add(name)
-                    
-                    if len(places) >= limit:
-                        break
-            
-            return places[:limit]
-        except Exception as e:
-            print(f"Error fetching tourist attractions: {e}")
-            return []
+                add_name(name)
+                append({
+                    "name": name,
+                    "type": tags["tourism"] or "attraction"
+                })
+                
+                if len(places) >= limit:
+                    break
+        
+        return places, meta.get("remark")
 
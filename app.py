@@ -1,16 +1,43 @@
 """
 Flask web application for Multi-Agent Tourism System
 """
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, render_template, request, jsonify, stream_with_context
 from offline_main import TourismSystemOffline
 from agents import TourismAIAgent
-from translator import translator, LANGUAGES
-from openai import OpenAI
+from api_clients import WORKER_THREADS, _normalize_place
+from translator import translator, LANGUAGES, SENTENCE_SPLIT_RE
+from cachetools import TTLCache
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator, Optional, Tuple
+import atexit
+import json
+import logging
+import logging.handlers
 import os
+import queue
+import re
+import threading
+import traceback
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# Request threads only enqueue log records; a background listener does the
+# formatting and the (possibly slow) write to stderr. The queue handler is
+# added to the root logger directly: basicConfig would give it a formatter
+# of its own and the listener would format each message twice.
+log_queue = queue.SimpleQueue()
+log_handler = logging.StreamHandler()
+log_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+log_listener = logging.handlers.QueueListener(log_queue, log_handler)
+log_listener.start()
+# Flush queued records when the process exits
+atexit.register(log_listener.stop)
+logging.getLogger().addHandler(logging.handlers.QueueHandler(log_queue))
+logging.getLogger().setLevel(logging.INFO)
+logger = logging.getLogger(__name__)
+
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'tourism-system-secret-key'
 
@@ -31,6 +58,44 @@ except Exception as e:
     online_system = None
     print(f"⚠ AI Mode disabled: {str(e)}")
 
+# Single OpenAI client (and connection pool) reused by every request
+openai_client = online_system.client if has_openai else None
+
+# Agent replies that explain why no place info was returned
+INFO_PREFIXES = ("I couldn't identify", "I don't know")
+
+# OpenAI failures that get a dedicated error message
+OPENAI_ERROR_RE = re.compile(r"(?P<quota>quota|insufficient)|(?P<auth>api key|authentication)")
+
+# Short-lived verification results: the UI usually calls /api/verify-place
+# and then /api/query for the same place
+verification_cache = TTLCache(maxsize=2048, ttl=30)
+verification_lock = threading.Lock()
+
+
+def cached_verify_place(place_name: str) -> Tuple[bool, Optional[dict], str]:
+    """
+    Verify a place with strict checking, reusing results from the last 30 seconds.
+    
+    Lookups that returned no place details (not found or Nominatim failed)
+    are not cached, so a transient error is retried on the next request.
+    
+    Args:
+        place_name: Name of the place to verify
+        
+    Returns:
+        Tuple of (exists, place_details, message)
+    """
+    key = _normalize_place(place_name)
+    with verification_lock:
+        result = verification_cache.get(key)
+    if result is None:
+        result = offline_system.nominatim.verify_place_exists(place_name, strict=True)
+        if result[1] is not None:
+            with verification_lock:
+                verification_cache[key] = result
+    return result
+
 
 @app.route('/')
 def index():
@@ -42,13 +107,13 @@ def index():
 def query():
     """API endpoint for processing queries"""
     try:
-        data = request.json
-        place_name = data.get('place', '').strip()
+        data = request.get_json(silent=True) or {}
+        place_name = (data.get('place') or '').strip()
         mode = data.get('mode', 'offline')  # 'offline' or 'online'
-        get_weather = data.get('weather', False)
-        get_places = data.get('places', False)
-        user_input = data.get('user_input', '')  # For online mode
-        target_lang = data.get('language', 'en')  # Translation language
+        get_weather = bool(data.get('weather'))
+        get_places = bool(data.get('places'))
+        user_input = data.get('user_input') or ''  # For online mode
+        target_lang = data.get('language') or 'en'  # Translation language
         
         if not place_name and not user_input:
             return jsonify({
@@ -75,7 +140,7 @@ def query():
                 response = online_system.process_query(user_input)
                 
                 # Check if response is an error message
-                if not response or response.startswith("I couldn't identify") or response.startswith("I don't know"):
+                if not response or response.startswith(INFO_PREFIXES):
                     # Translate response if needed
                     if target_lang != 'en':
                         response = translator.translate_response(response, target_lang)
@@ -104,19 +169,18 @@ def query():
                 }), 500
             except Exception as e:
                 # Log the full error for debugging
-                import traceback
-                error_trace = traceback.format_exc()
-                print(f"AI Mode Error: {error_trace}")
+                logger.exception("AI Mode Error")
                 
                 # Check for specific OpenAI errors
-                error_str = str(e).lower()
-                if 'quota' in error_str or 'insufficient' in error_str:
+                error_match = OPENAI_ERROR_RE.search(str(e).lower())
+                error_kind = error_match.lastgroup if error_match else None
+                if error_kind == 'quota':
                     return jsonify({
                         'success': False,
                         'error': 'OpenAI API quota exceeded. Please check your account billing or try again later.',
                         'fallback': True
                     }), 429
-                elif 'api key' in error_str or 'authentication' in error_str:
+                elif error_kind == 'auth':
                     return jsonify({
                         'success': False,
                         'error': 'Invalid OpenAI API key. Please check your .env file.',
@@ -127,7 +191,7 @@ def query():
                         'success': False,
                         'error': f'Error processing query: {str(e)}. Try using Offline Mode instead.',
                         'fallback': True,
-                        'details': error_trace if app.debug else None
+                        'details': traceback.format_exc() if app.debug else None
                     }), 500
         
         # Use offline mode
@@ -138,11 +202,11 @@ def query():
             }), 400
         
         # Verify place exists with strict checking
-        exists, place_details, message = offline_system.nominatim.verify_place_exists(place_name, strict=True)
+        exists, place_details, message = cached_verify_place(place_name)
         
         if not exists:
             # Generate natural AI response for non-existent place
-            error_message = generate_error_response(place_name, target_lang, has_openai)
+            error_message = generate_error_response(place_name, target_lang)
             return jsonify({
                 'success': False,
                 'error': error_message,
@@ -154,7 +218,7 @@ def query():
         coords = (place_details['lat'], place_details['lon'])
         
         # Process query
-        response = offline_system.process_query(place_name, get_weather, get_places)
+        response = offline_system.process_query(place_name, get_weather, get_places, coords)
         
         # Translate response if needed
         if target_lang != 'en':
@@ -176,13 +240,130 @@ def query():
         }), 500
 
 
+# Sentence-sized chunks of streamed responses are translated here while
+# generation continues, shared by all streams
+translation_executor = ThreadPoolExecutor(max_workers=WORKER_THREADS, thread_name_prefix="translate")
+
+def translate_keeping_whitespace(text: str, target_lang: str) -> str:
+    """
+    Translate text, re-attaching its leading and trailing whitespace.
+    
+    Translation backends trim the separators between streamed sentences,
+    which would glue the translated sentences together.
+    """
+    stripped = text.strip()
+    if not stripped:
+        return text
+    start = text.index(stripped)
+    translated = translator.translate(stripped, target_lang) or stripped
+    return text[:start] + translated + text[start + len(stripped):]
+
+
+def translate_stream(pieces: Iterable[str], target_lang: str) -> Iterator[str]:
+    """
+    Translate streamed text sentence by sentence.
+    
+    Text is buffered until a sentence boundary (the same rule the translator
+    uses to split whole responses), and each complete sentence is translated
+    in the background so translation overlaps with generation. Translations
+    are yielded in the original order.
+    
+    Args:
+        pieces: Pieces of English response text
+        target_lang: Target language code
+        
+    Yields:
+        Translated sentences
+    """
+    pending = deque()
+    buffer = ""
+    
+    for piece in pieces:
+        buffer += piece
+        boundaries = list(SENTENCE_SPLIT_RE.finditer(buffer))
+        if boundaries:
+            cut = boundaries[-1].end()
+            sentence, buffer = buffer[:cut], buffer[cut:]
+            pending.append(translation_executor.submit(translate_keeping_whitespace, sentence, target_lang))
+        
+        while pending and pending[0].done():
+            yield pending.popleft().result()
+    
+    if buffer:
+        pending.append(translation_executor.submit(translate_keeping_whitespace, buffer, target_lang))
+    
+    while pending:
+        yield pending.popleft().result()
+
+
+def sse_event(data: dict, event: str = None) -> str:
+    """Format a Server-Sent Events frame"""
+    frame = f"data: {json.dumps(data)}\n\n"
+    if event:
+        frame = f"event: {event}\n{frame}"
+    return frame
+
+
+@app.route('/api/query/stream', methods=['POST'])
+def query_stream():
+    """API endpoint streaming AI Mode responses as Server-Sent Events"""
+    data = request.get_json(silent=True) or {}
+    user_input = (data.get('user_input') or '').strip()
+    target_lang = data.get('language') or 'en'
+    
+    if not has_openai:
+        return jsonify({
+            'success': False,
+            'error': 'AI Mode is not available. OpenAI API key is missing. Please use Offline Mode instead.',
+            'fallback': True
+        }), 400
+    
+    if not user_input:
+        return jsonify({
+            'success': False,
+            'error': 'Please enter your query in the text area'
+        }), 400
+    
+    def generate():
+        english = []
+        
+        def english_pieces():
+            for piece in online_system.process_query_stream(user_input):
+                english.append(piece)
+                yield piece
+        
+        pieces = english_pieces()
+        if target_lang != 'en':
+            pieces = translate_stream(pieces, target_lang)
+        
+        try:
+            for piece in pieces:
+                yield sse_event({'t': piece})
+            
+            response = "".join(english)
+            is_info = not response or response.startswith(INFO_PREFIXES)
+            yield sse_event({'is_info': is_info}, event='done')
+        except Exception as e:
+            logger.exception("AI Mode streaming error")
+            yield sse_event({
+                'error': f'Error processing query: {str(e)}. Try using Offline Mode instead.',
+                'fallback': True
+            }, event='error')
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
 @app.route('/api/verify-place', methods=['POST'])
 def verify_place():
     """Verify if a place exists and get coordinates"""
     try:
-        data = request.json
-        place_name = data.get('place', '').strip()
-        target_lang = data.get('language', 'en')
+        data = request.get_json(silent=True) or {}
+        place_name = (data.get('place') or '').strip()
+        target_lang = data.get('language') or 'en'
         
         if not place_name:
             error_msg = 'Please provide a place name'
@@ -194,7 +375,7 @@ def verify_place():
             }), 400
         
         # Verify place with strict checking
-        exists, place_details, message = offline_system.nominatim.verify_place_exists(place_name, strict=True)
+        exists, place_details, message = cached_verify_place(place_name)
         
         if exists and place_details:
             # Show what was actually found
@@ -216,7 +397,7 @@ def verify_place():
             })
         else:
             # Generate natural AI response
-            error_msg = generate_error_response(place_name, target_lang, has_openai)
+            error_msg = generate_error_response(place_name, target_lang)
             found_place = place_details.get('display_name') if place_details else None
             return jsonify({
                 'success': False,
@@ -233,9 +414,16 @@ def verify_place():
         }), 500
 
 
+# "Place doesn't exist" message per language code, filled in as languages are used
+ERROR_MESSAGES = {'en': "I don't know this place exists."}
+
+
 def generate_error_response(place_name: str, target_lang: str = 'en', use_ai: bool = False) -> str:
     """
-    Generate a natural AI response for non-existent places.
+    Generate a natural response for non-existent places.
+    
+    By default this is the canned message from ERROR_MESSAGES; an OpenAI
+    paraphrase is only requested when use_ai is set.
     
     Args:
         place_name: The place name that doesn't exist
@@ -246,49 +434,50 @@ def generate_error_response(place_name: str, target_lang: str = 'en', use_ai: bo
         Natural error message
     """
     # Try to use AI for natural response if available
-    if use_ai and has_openai:
+    if use_ai and openai_client is not None:
         try:
-            api_key = os.getenv("OPENAI_API_KEY")
-            if api_key:
-                client = OpenAI(api_key=api_key)
-                prompt = f"""The user asked about a place called "{place_name}", but this place doesn't exist in the database. 
+            prompt = f"""The user asked about a place called "{place_name}", but this place doesn't exist in the database. 
 Respond naturally and politely that you don't know this place exists. 
 Keep it brief and friendly, similar to: "I don't know this place exists."
 Do not suggest alternatives or ask questions, just state that you don't know this place exists.
 
 Your response:"""
-                
-                response = client.chat.completions.create(
-                    model="gpt-3.5-turbo",
-                    messages=[
-                        {"role": "system", "content": "You are a helpful tourism assistant. When a place doesn't exist, respond naturally and politely saying you don't know this place exists."},
-                        {"role": "user", "content": prompt}
-                    ],
-                    temperature=0.7,
-                    max_tokens=50
-                )
-                error_msg = response.choices[0].message.content.strip()
-                
-                # Translate if needed
-                if target_lang != 'en':
-                    error_msg = translator.translate(error_msg, target_lang)
-                
-                return error_msg
+            
+            response = openai_client.chat.completions.create(
+                model="gpt-3.5-turbo",
+                messages=[
+                    {"role": "system", "content": "You are a helpful tourism assistant. When a place doesn't exist, respond naturally and politely saying you don't know this place exists."},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=0.7,
+                max_tokens=50
+            )
+            error_msg = response.choices[0].message.content.strip()
+            
+            # Translate if needed
+            if target_lang != 'en':
+                error_msg = translator.translate(error_msg, target_lang)
+            
+            return error_msg
         except Exception as e:
-            print(f"AI error response generation failed: {e}")
+            logger.warning("AI error response generation failed: %s", e)
             # Fall through to default message
     
-    # Default natural message
-    error_msg = f"I don't know this place exists."
-    
-    # Translate if needed
-    if target_lang != 'en':
-        error_msg = translator.translate(error_msg, target_lang)
+    # Default natural message, translated at most once per language
+    error_msg = ERROR_MESSAGES.get(target_lang)
+    if error_msg is None:
+        error_msg = translator.translate(ERROR_MESSAGES['en'], target_lang) or ERROR_MESSAGES['en']
+        # Only keep real translations; a failed one returns the English text
+        if error_msg != ERROR_MESSAGES['en']:
+            ERROR_MESSAGES[target_lang] = error_msg
     
     return error_msg
 
 
 if __name__ == '__main__':
+    # Development server only; in production run under gunicorn:
+    #   gunicorn -k gthread -w 4 --threads 32 -b 0.0.0.0:5000 app:app
     port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port, debug=True)
+    debug = os.environ.get('FLASK_DEBUG', '1') == '1'
+    app.run(host='0.0.0.0', port=port, debug=debug, threaded=True)
 
@@ -0,0 +1,127 @@
+"""
+Persistent key/value cache backed by SQLite
+"""
+from typing import Optional
+import logging
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class SQLiteCache:
+    """
+    Small on-disk cache that survives process restarts.
+    
+    Values are stored as bytes together with the time they were written;
+    entries older than the TTL are treated as missing and removed by
+    purge_expired(), which also runs automatically every purge_every writes.
+    Errors (locked or read-only database) are logged and treated as cache
+    misses so callers can always fall back to the network.
+    """
+    
+    def __init__(self, path: str, table: str = "cache", ttl: Optional[float] = None,
+                 purge_every: int = 500):
+        """
+        Open (or create) the cache database.
+        
+        Args:
+            path: SQLite database file path
+            table: Table name, so several caches can share one file
+            ttl: Time-to-live in seconds, or None to keep entries forever
+            purge_every: Sweep expired entries after this many writes
+        """
+        self.path = path
+        self.table = table
+        self.ttl = ttl
+        self.purge_every = purge_every
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._conn = None
+        
+        try:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            with self._conn:
+                self._conn.execute(
+                    f"CREATE TABLE IF NOT EXISTS {table} "
+                    "(key TEXT PRIMARY KEY, value BLOB, ts INTEGER)"
+                )
+        except sqlite3.Error as e:
+            logger.warning("Disk cache %s unavailable: %s", path, e)
+            self._conn = None
+    
+    def get(self, key: str) -> Optional[bytes]:
+        """
+        Look up a value.
+        
+        Args:
+            key: Cache key
+            
+        Returns:
+            Stored bytes or None if missing or expired
+        """
+        if self._conn is None:
+            return None
+        
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    f"SELECT value, ts FROM {self.table} WHERE key = ?", (key,)
+                ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning("Disk cache read failed: %s", e)
+            return None
+        
+        if row is None:
+            return None
+        value, ts = row
+        if self.ttl is not None and time.time() - ts > self.ttl:
+            return None
+        return value
+    
+    def set(self, key: str, value: bytes) -> None:
+        """
+        Store a value.
+        
+        Args:
+            key: Cache key
+            value: Bytes to store
+        """
+        if self._conn is None:
+            return
+        
+        try:
+            with self._lock, self._conn:
+                self._conn.execute(
+                    f"INSERT OR REPLACE INTO {self.table} (key, value, ts) VALUES (?, ?, ?)",
+                    (key, value, int(time.time()))
+                )
+                self._writes += 1
+                purge = self._writes % self.purge_every == 0
+        except sqlite3.Error as e:
+            logger.warning("Disk cache write failed: %s", e)
+            return
+        
+        if purge:
+            self.purge_expired()
+    
+    def purge_expired(self) -> int:
+        """
+        Delete expired entries.
+        
+        Returns:
+            Number of entries removed
+        """
+        if self._conn is None or self.ttl is None:
+            return 0
+        
+        try:
+            with self._lock, self._conn:
+                cursor = self._conn.execute(
+                    f"DELETE FROM {self.table} WHERE ts < ?", (int(time.time() - self.ttl),)
+                )
+            return cursor.rowcount
+        except sqlite3.Error as e:
+            logger.warning("Disk cache purge failed: %s", e)
+            return 0
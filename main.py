@@ -2,6 +2,7 @@
 Main application for Multi-Agent Tourism System
 """
 from agents import TourismAIAgent
+import logging
 import os
 from dotenv import load_dotenv
 
@@ -10,6 +11,8 @@ load_dotenv()
 
 def main():
     """Main application loop"""
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s: %(message)s")
+    
     print("=" * 60)
     print("Multi-Agent Tourism System")
     print("=" * 60)
@@ -2,8 +2,10 @@
 Offline version of Multi-Agent Tourism System
 Works without OpenAI - uses direct user input and API calls only
 """
-from api_clients import NominatimClient, OpenMeteoClient, OverpassClient
+from api_clients import NominatimClient, OpenMeteoClient, OverpassClient, WORKER_THREADS
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, Tuple
+import logging
 
 
 class TourismSystemOffline:
@@ -13,10 +15,14 @@ class TourismSystemOffline:
         self.nominatim = NominatimClient()
         self.open_meteo = OpenMeteoClient()
         self.overpass = OverpassClient()
+        # Weather and places lookups are independent, so the places lookup runs
+        # here while the calling thread fetches the weather
+        self._executor = ThreadPoolExecutor(max_workers=WORKER_THREADS, thread_name_prefix="offline-query")
     
-    def get_weather_info(self, place_name: str) -> Optional[str]:
-        """Get weather information for a place"""
-        coords = self.nominatim.get_coordinates(place_name)
+    def get_weather_info(self, place_name: str, coords: Optional[Tuple[float, float]] = None) -> Optional[str]:
+        """Get weather information for a place, geocoding it unless coords are given"""
+        if coords is None:
+            coords = self.nominatim.get_coordinates(place_name)
         if not coords:
             return None
         
@@ -31,44 +37,60 @@ class TourismSystemOffline:
         
         return f"In {place_name} it's currently {temp}{unit} with a chance of {precip_prob}% to rain."
     
-    def get_places_info(self, place_name: str, limit: int = 5) -> Optional[str]:
-        """Get tourist attractions for a place"""
-        coords = self.nominatim.get_coordinates(place_name)
+    def get_places_info(self, place_name: str, limit: int = 5,
+                        coords: Optional[Tuple[float, float]] = None) -> Optional[Tuple[str, str]]:
+        """
+        Get tourist attractions for a place, geocoding it unless coords are given.
+        
+        Returns:
+            Tuple of (header line, newline-separated places list) or None if
+            place not found
+        """
+        if coords is None:
+            coords = self.nominatim.get_coordinates(place_name)
         if not coords:
             return None
         
         lat, lon = coords
         attractions = self.overpass.get_tourist_attractions(lat, lon, limit)
         
+        header = f"In {place_name} these are the places you can go, - - - - -"
         if not attractions:
-            return f"In {place_name} these are the places you can go, - - - - -\n(No tourist attractions found in the database)"
+            return (header, "(No tourist attractions found in the database)")
         
-        places_list = "\n".join([f"{place['name']}" for place in attractions])
-        return f"In {place_name} these are the places you can go, - - - - -\n{places_list}"
+        return (header, "\n".join(place["name"] for place in attractions))
     
-    def process_query(self, place_name: str, get_weather: bool, get_places: bool) -> str:
+    def process_query(self, place_name: str, get_weather: bool, get_places: bool,
+                      coords: Optional[Tuple[float, float]] = None) -> str:
         """Process query and return combined response"""
+        # Geocode once up front (unless the caller already verified the place)
+        if coords is None and (get_weather or get_places):
+            coords = self.nominatim.get_coordinates(place_name)
+        
+        places_future = None
+        if coords and get_weather and get_places:
+            places_future = self._executor.submit(self.get_places_info, place_name, coords=coords)
+        
         response_parts = []
         
         if get_weather:
-            weather_info = self.get_weather_info(place_name)
+            weather_info = self.get_weather_info(place_name, coords) if coords else None
             if weather_info:
                 response_parts.append(weather_info)
             else:
                 response_parts.append(f"Could not retrieve weather information for {place_name}.")
         
         if get_places:
-            places_info = self.get_places_info(place_name)
+            if places_future is not None:
+                places_info = places_future.result()
+            else:
+                places_info = self.get_places_info(place_name, coords=coords) if coords else None
             if places_info:
+                header, places_list = places_info
                 if get_weather and response_parts:
-                    # Extract just the places list
-                    if "\n" in places_info:
-                        places_list = places_info.split("\n", 1)[1]
-                        response_parts.append(f"And these are the places you can go: - - - - -\n{places_list}")
-                    else:
-                        response_parts.append(f"And {places_info}")
+                    response_parts.append(f"And these are the places you can go: - - - - -\n{places_list}")
                 else:
-                    response_parts.append(places_info)
+                    response_parts.append(f"{header}\n{places_list}")
             else:
                 response_parts.append(f"Could not retrieve tourist attractions for {place_name}.")
         
@@ -101,6 +123,8 @@ def get_user_choice(prompt: str, options: list) -> str:
 
 def main():
     """Main application loop for offline mode"""
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s: %(message)s")
+    
     print("=" * 60)
     print("Multi-Agent Tourism System - OFFLINE MODE")
     print("=" * 60)
@@ -150,7 +174,7 @@ def main():
             
             # Process query
             print("\nProcessing your request...")
-            response = system.process_query(place_name, get_weather, get_places)
+            response = system.process_query(place_name, get_weather, get_places, coords)
             print(f"\n{'='*60}")
             print("RESULT:")
             print('='*60)
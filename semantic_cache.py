@@ -0,0 +1,117 @@
+"""
+Embedding-based cache that serves translations of near-duplicate texts
+"""
+from typing import Dict, List, Optional, Tuple
+import logging
+import re
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Numbers and proper nouns must match exactly for a semantic hit: "20°C"
+# and "21°C", or "In Rome ..." and "In Paris ...", embed almost identically
+# but must not share a translation
+NUMBER_RE = re.compile(r"\d+(?:[.,]\d+)?")
+# Capitalized words and words written in non-Latin scripts (北京)
+PROPER_NOUN_RE = re.compile(r"\b[A-Z][\w'-]*|[^\W\d_]*[^\x00-\u024F\W][^\W\d_]*")
+
+
+def _signature(text: str) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+    """Numbers and proper nouns that two texts must share to reuse a translation"""
+    return tuple(NUMBER_RE.findall(text)), tuple(PROPER_NOUN_RE.findall(text))
+
+
+class SemanticCache:
+    """
+    Nearest-neighbour cache of translations per target language.
+
+    Source texts are embedded with a small sentence-transformers model and
+    kept as normalized float16 vectors in a fixed-size ring per language; a
+    lookup returns the translation of the most similar cached text when the
+    cosine similarity reaches the threshold and both texts contain the same
+    numbers and proper nouns.
+
+    Requires the optional sentence-transformers package (and numpy).
+    """
+
+    def __init__(self, threshold: float = 0.9, model_name: str = "all-MiniLM-L6-v2",
+                 max_entries: int = 4096):
+        """
+        Load the embedding model.
+
+        Args:
+            threshold: Minimum cosine similarity for a hit
+            model_name: sentence-transformers model name
+            max_entries: Texts kept per target language; the oldest are
+                overwritten first
+
+        Raises:
+            ImportError: If sentence-transformers is not installed
+        """
+        import numpy
+        from sentence_transformers import SentenceTransformer
+
+        self._np = numpy
+        self._model = SentenceTransformer(model_name)
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # target_lang -> vectors, source texts, translations and next slot
+        self._vectors: Dict[str, "numpy.ndarray"] = {}
+        self._sources: Dict[str, List[Optional[str]]] = {}
+        self._translations: Dict[str, List[Optional[str]]] = {}
+        self._next: Dict[str, int] = {}
+
+    def _embed(self, text: str):
+        """Normalized float16 embedding of text"""
+        vector = self._model.encode(text, normalize_embeddings=True)
+        return vector.astype(self._np.float16)
+
+    def get(self, text: str, target_lang: str) -> Optional[str]:
+        """
+        Look up the translation of a text similar to text.
+
+        Args:
+            text: Text to translate
+            target_lang: Target language code
+
+        Returns:
+            Cached translation or None if nothing is similar enough
+        """
+        with self._lock:
+            if target_lang not in self._vectors:
+                return None
+
+        vector = self._embed(text)
+        with self._lock:
+            scores = self._vectors[target_lang] @ vector
+            best = int(scores.argmax())
+            source = self._sources[target_lang][best]
+            if source is None or scores[best] < self.threshold:
+                return None
+            if _signature(source) != _signature(text):
+                return None
+            return self._translations[target_lang][best]
+
+    def add(self, text: str, target_lang: str, translation: str) -> None:
+        """
+        Remember a translation.
+
+        Args:
+            text: Source text
+            target_lang: Target language code
+            translation: Translated text
+        """
+        vector = self._embed(text)
+        with self._lock:
+            if target_lang not in self._vectors:
+                self._vectors[target_lang] = self._np.zeros((self.max_entries, vector.shape[0]), dtype=self._np.float16)
+                self._sources[target_lang] = [None] * self.max_entries
+                self._translations[target_lang] = [None] * self.max_entries
+                self._next[target_lang] = 0
+
+            slot = self._next[target_lang]
+            self._vectors[target_lang][slot] = vector
+            self._sources[target_lang][slot] = text
+            self._translations[target_lang][slot] = translation
+            self._next[target_lang] = (slot + 1) % self.max_entries
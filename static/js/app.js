@@ -227,48 +227,99 @@ async function searchOnline() {
     hideResults();
 
     try {
-        const response = await fetch('/api/query', {
+        // Stream the answer so it renders as soon as the first part is ready
+        const response = await fetch('/api/query/stream', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json'
             },
             body: JSON.stringify({
                 user_input: userInput,
-                mode: 'online',
                 language: currentLanguage
             })
         });
 
-        const data = await response.json();
-        hideLoading();
+        if (!response.ok) {
+            const data = await response.json();
+            hideLoading();
+            showOnlineError(data);
+            return;
+        }
 
-        if (data.success) {
-            // Check if it's an informational message (like "I don't know this place exists")
-            if (data.is_info) {
-                showError(data.response || data.error, 'ai-error');
-            } else {
-                showResults(data.response);
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let text = '';
+
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) {
+                break;
             }
-        } else {
-            // Show error with fallback suggestion
-            let errorMsg = data.error || 'Failed to process query';
-            if (data.fallback) {
-                errorMsg += '\n\n💡 Tip: Try using Offline Mode instead (no OpenAI required)';
-            }
-            
-            // Show AI-generated error response naturally
-            if (data.is_ai_response) {
-                showError(errorMsg, 'ai-error');
-            } else {
-                showError(errorMsg);
+            buffer += decoder.decode(value, { stream: true });
+
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                const event = parseSseEvent(buffer.slice(0, boundary));
+                buffer = buffer.slice(boundary + 2);
+
+                if (event.type === 'error') {
+                    hideLoading();
+                    hideResults();
+                    showOnlineError(event.data);
+                    return;
+                }
+
+                if (event.type === 'done') {
+                    hideLoading();
+                    // Informational message (like "I don't know this place exists")
+                    if (event.data.is_info) {
+                        hideResults();
+                        showError(text, 'ai-error');
+                    }
+                    return;
+                }
+
+                text += event.data.t;
+                hideLoading();
+                showResults(text);
             }
         }
+        hideLoading();
     } catch (error) {
         hideLoading();
         showError('Error: ' + error.message);
     }
 }
 
+function parseSseEvent(frame) {
+    let type = 'message';
+    let data = '';
+    frame.split('\n').forEach(line => {
+        if (line.startsWith('event:')) {
+            type = line.slice(6).trim();
+        } else if (line.startsWith('data:')) {
+            data += line.slice(5).trim();
+        }
+    });
+    return { type: type, data: data ? JSON.parse(data) : {} };
+}
+
+function showOnlineError(data) {
+    // Show error with fallback suggestion
+    let errorMsg = data.error || 'Failed to process query';
+    if (data.fallback) {
+        errorMsg += '\n\n💡 Tip: Try using Offline Mode instead (no OpenAI required)';
+    }
+
+    // Show AI-generated error response naturally
+    if (data.is_ai_response) {
+        showError(errorMsg, 'ai-error');
+    } else {
+        showError(errorMsg);
+    }
+}
+
 // UI Helpers
 function showLoading() {
     document.getElementById('loading-overlay').style.display = 'flex';
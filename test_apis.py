@@ -61,6 +61,17 @@ def test_open_meteo():
         print("❌ FAILED: Could not get weather data")
         return False
     
+    # Batched request for several locations in one call
+    print("\nTest: Getting weather for Paris and Tokyo in one request...")
+    batch = client.get_weather_many([(48.8566, 2.3522), (35.6762, 139.6503)])
+    
+    if len(batch) == 2 and all(batch):
+        print(f"✅ SUCCESS: Paris {batch[0].get('temperature')}{batch[0].get('unit', '°C')}, "
+              f"Tokyo {batch[1].get('temperature')}{batch[1].get('unit', '°C')}")
+    else:
+        print("❌ FAILED: Could not get batched weather data")
+        return False
+    
     print()
     return True
 
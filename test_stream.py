@@ -0,0 +1,43 @@
+"""
+Test script for streamed translation - runs offline with a mocked translator
+"""
+from unittest import mock
+import random
+import time
+
+import app
+
+
+def fake_translate(text, target_lang='en', source_lang='auto'):
+    """Stand-in translator: upper-cases text after a random delay"""
+    time.sleep(random.uniform(0, 0.02))
+    return f"<{text.upper()}>"
+
+
+def test_translate_stream():
+    """Sentences come back in order with the separators between them intact"""
+    
+    print("=" * 60)
+    print("Testing streamed translation - OFFLINE (mocked translator)")
+    print("=" * 60)
+    
+    text = "Visit Mt. Fuji today. It is 3.5°C!  Day 12.\nNext? ok"
+    # Feed the text in small pieces, as the model streams it
+    pieces = [text[i:i + 3] for i in range(0, len(text), 3)]
+    
+    with mock.patch.object(app.translator, "translate", side_effect=fake_translate):
+        output = "".join(app.translate_stream(pieces, "fr"))
+    
+    expected = "<VISIT MT. FUJI TODAY.> <IT IS 3.5°C!>  <DAY 12.>\n<NEXT?> <OK>"
+    print(f"\nInput:    {text!r}")
+    print(f"Output:   {output!r}")
+    print(f"Expected: {expected!r}")
+    assert output == expected
+    
+    print("\n" + "=" * 60)
+    print("Testing Complete!")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    test_translate_stream()
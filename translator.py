@@ -1,12 +1,27 @@
 """
 Translation service for multi-language support
 """
-from typing import Optional
+from api_clients import WORKER_THREADS, create_session
+from bisect import bisect_right
+from cachetools import LFUCache, LRUCache
+from concurrent.futures import Future, ThreadPoolExecutor
+from disk_cache import SQLiteCache
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Callable, Dict, List, Optional, Tuple, Union
 import requests
-import json
+import hashlib
+import logging
+import orjson
+import os
+import re
+import threading
+import zstandard
 
-# Language codes mapping
-LANGUAGES = {
+logger = logging.getLogger(__name__)
+
+# Language codes mapping (read-only)
+LANGUAGES = MappingProxyType({
     'en': 'English',
     'es': 'Spanish',
     'fr': 'French',
@@ -43,7 +58,159 @@ LANGUAGES = {
     'et': 'Estonian',
     'lv': 'Latvian',
     'lt': 'Lithuanian',
-}
+})
+
+
+# Splits text at whitespace after sentence-ending punctuation and at line
+# breaks, keeping the separators so the text can be reassembled exactly;
+# decimals ("3.5") and short abbreviations ("Mt. Fuji", "St. Paul") stay whole
+SENTENCE_SPLIT_RE = re.compile(r"((?<!\b[A-Z][a-z]\.)(?<=[.!?])\s+|\n)")
+
+
+# Number of translations kept in memory
+TRANSLATOR_CACHE_SIZE = int(os.environ.get('TRANSLATOR_CACHE_SIZE', 8192))
+
+# In-memory cache classes selectable with Translator(cache_policy=...)
+CACHE_POLICIES = {'lru': LRUCache, 'lfu': LFUCache}
+
+# On-disk translation cache shared across restarts
+TRANSLATION_CACHE_PATH = os.getenv(
+    'TRANSLATION_CACHE_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'translations.db')
+)
+TRANSLATION_TTL = 72 * 60 * 60  # 72 hours
+
+# Placeholder standing in for place name number N during translation,
+# tolerating case changes and whitespace the backend may introduce
+PLACEHOLDER_RE = re.compile(r"XPLACEHOLDERX\s*(\d+)\s*X", re.IGNORECASE)
+
+# Cached translations at least this many bytes long are zstd-compressed;
+# below it the frame overhead outweighs the savings
+COMPRESS_MIN_SIZE = 64
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+# zstd contexts aren't thread-safe, so each thread gets its own
+_zstd = threading.local()
+
+
+def _pack(text: str) -> bytes:
+    """UTF-8 encode text for the caches, zstd-compressing long values"""
+    data = text.encode('utf-8')
+    if len(data) < COMPRESS_MIN_SIZE:
+        return data
+    if not hasattr(_zstd, 'compressor'):
+        _zstd.compressor = zstandard.ZstdCompressor(level=3)
+    return _zstd.compressor.compress(data)
+
+
+def _unpack(blob: bytes) -> str:
+    """Inverse of _pack; plain UTF-8 never starts with the zstd magic number"""
+    if blob.startswith(ZSTD_MAGIC):
+        if not hasattr(_zstd, 'decompressor'):
+            _zstd.decompressor = zstandard.ZstdDecompressor()
+        blob = _zstd.decompressor.decompress(blob)
+    return blob.decode('utf-8')
+
+
+# Joins texts sent to MyMemory (which has no array input) in one request;
+# the marker survives translation unchanged, though the whitespace around
+# it may not
+BATCH_SEPARATOR = "\n§§§\n"
+BATCH_SPLIT_RE = re.compile(r"\s*§§§\s*")
+# Texts per joined MyMemory request
+FALLBACK_BATCH_SIZE = 20
+
+
+class TranslationError(Exception):
+    """Raised when no translation backend could translate the text"""
+
+
+# Script codepoint ranges checked by detect_language, in priority order:
+# Japanese kana wins over the CJK ideographs Japanese shares with Chinese
+SCRIPTS = (
+    ('ja', 0x3040, 0x30FF),  # Japanese
+    ('zh', 0x4E00, 0x9FFF),  # Chinese
+    ('ko', 0xAC00, 0xD7A3),  # Korean
+    ('ar', 0x0600, 0x06FF),  # Arabic
+    ('hi', 0x0900, 0x097F),  # Hindi
+    ('th', 0x0E00, 0x0E7F),  # Thai
+)
+
+SCRIPT_PRIORITY = {lang: rank for rank, (lang, _, _) in enumerate(SCRIPTS)}
+
+# The same scripts as (first, last, lang) codepoint ranges sorted by start,
+# for bisecting single characters
+SCRIPT_RANGES = tuple(sorted((first, last, lang) for lang, first, last in SCRIPTS))
+SCRIPT_STARTS = [first for first, _, _ in SCRIPT_RANGES]
+
+
+def _script_class(scripts) -> re.Pattern:
+    """Compiled character class matching any of the given scripts"""
+    return re.compile("[" + "".join(f"\\u{first:04X}-\\u{last:04X}" for _, first, last in scripts) + "]")
+
+
+# For no script yet and for each script but the first, a character class of
+# the scripts that outrank it, so a long text is scanned once, only for
+# characters that can still change the answer
+OUTRANKING_PATTERNS = {None: _script_class(SCRIPTS)}
+OUTRANKING_PATTERNS.update(
+    (lang, _script_class(SCRIPTS[:rank])) for rank, (lang, _, _) in enumerate(SCRIPTS) if rank
+)
+
+# Texts up to this length are classified in one pass over their characters
+SHORT_TEXT_LENGTH = 64
+
+
+def _script_of(code: int) -> Optional[str]:
+    """Language code of the script a codepoint belongs to, or None"""
+    i = bisect_right(SCRIPT_STARTS, code) - 1
+    if i >= 0 and code <= SCRIPT_RANGES[i][1]:
+        return SCRIPT_RANGES[i][2]
+    return None
+
+
+@lru_cache(maxsize=1024)
+def _detect_language(text: str) -> str:
+    """Guess a language code from the character sets used in the text"""
+    best = None
+    if len(text) <= SHORT_TEXT_LENGTH:
+        for char in text:
+            code = ord(char)
+            if code < 0x0600:
+                continue
+            lang = _script_of(code)
+            if lang == 'ja':
+                return lang  # Highest priority, nothing can beat it
+            if lang and (best is None or SCRIPT_PRIORITY[lang] < SCRIPT_PRIORITY[best]):
+                best = lang
+        return best or 'en'
+    
+    # Each search resumes after the previous match and looks only for
+    # higher-priority scripts, so the text is traversed at most once in C
+    pos = 0
+    while best != 'ja':
+        match = OUTRANKING_PATTERNS[best].search(text, pos)
+        if match is None:
+            break
+        best = _script_of(ord(match.group()))
+        pos = match.end()
+    return best or 'en'  # Default to English
+
+
+# Any Unicode letter; text without one (numbers, punctuation, emoji) is
+# returned as is
+LETTER_RE = re.compile(r"[^\W\d_]")
+
+# Latin letters; English text with an embedded place name in another script
+# ("In 北京 it's sunny") still needs translating
+LATIN_RE = re.compile(r"[A-Za-z\u00C0-\u024F]")
+
+
+def _needs_translation(text: str, target_lang: str) -> bool:
+    """Whether text has letters and isn't written entirely in target_lang's script"""
+    if LETTER_RE.search(text) is None:
+        return False
+    return LATIN_RE.search(text) is not None or _detect_language(text) != target_lang
 
 
 class Translator:
@@ -51,9 +218,84 @@ class Translator:
     
     # Using LibreTranslate public API (free, no key required)
     BASE_URL = "https://libretranslate.de/translate"
+    FALLBACK_URL = "https://api.mymemory.translated.net/get"
     
-    def __init__(self):
-        self.supported_languages = LANGUAGES
+    def __init__(self, enable_semantic_cache: bool = False, semantic_threshold: float = 0.9,
+                 cache_policy: str = 'lru'):
+        """
+        Set up the caches and HTTP session.
+        
+        Args:
+            enable_semantic_cache: Also serve translations of near-duplicate
+                texts from an embedding cache (needs sentence-transformers)
+            semantic_threshold: Minimum cosine similarity for a semantic hit
+            cache_policy: In-memory eviction policy, 'lru' (least recently
+                used) or 'lfu' (least frequently used, keeps a hot set of
+                common phrases resident in long-running processes)
+            
+        Raises:
+            ValueError: If cache_policy is not a known policy
+        """
+        # Successful translations keyed by (text, target_lang, source_lang);
+        # failures aren't cached
+        if cache_policy not in CACHE_POLICIES:
+            raise ValueError(f"Unknown cache policy {cache_policy!r}, expected one of {sorted(CACHE_POLICIES)}")
+        self._cache = CACHE_POLICIES[cache_policy](maxsize=TRANSLATOR_CACHE_SIZE)
+        self._cache_lock = threading.Lock()
+        self._store = SQLiteCache(TRANSLATION_CACHE_PATH, table="translations", ttl=TRANSLATION_TTL)
+        # Keep-alive connections shared by every request to both services,
+        # with enough pooled connections per host for the translation threads
+        self._session = create_session(pool_connections=4, pool_maxsize=WORKER_THREADS)
+        self._executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="translate")
+        # Keys warmed by prefetch() and how often they were used afterwards
+        self._prefetched = LRUCache(maxsize=1024)
+        self.prefetch_count = 0
+        self.prefetch_hits = 0
+        # Translations currently being fetched, so concurrent misses for the
+        # same key wait for one request instead of each sending their own
+        self._inflight: Dict[Tuple[str, str, str], Future] = {}
+        self._inflight_lock = threading.Lock()
+        # translate() specialized per (target_lang, source_lang)
+        self._translator_for = lru_cache(maxsize=64)(self._make_translator)
+        self._semantic = None
+        if enable_semantic_cache:
+            try:
+                from semantic_cache import SemanticCache
+                self._semantic = SemanticCache(threshold=semantic_threshold)
+            except Exception as e:
+                logger.warning("Semantic translation cache disabled: %s", e)
+    
+    @staticmethod
+    def _store_key(key: Tuple[str, str, str]) -> str:
+        """Fixed-length disk cache key for a (text, target_lang, source_lang) key"""
+        text, target_lang, source_lang = key
+        return hashlib.blake2b(f"{source_lang}|{target_lang}|{text}".encode(), digest_size=16).hexdigest()
+    
+    def _cache_lookup(self, key: Tuple[str, str, str]) -> Optional[str]:
+        """Cached translation from memory, then disk, then near duplicates, or None"""
+        with self._cache_lock:
+            cached = self._cache.get(key)
+        if cached is not None:
+            return _unpack(cached) if isinstance(cached, bytes) else cached
+        
+        blob = self._store.get(self._store_key(key))
+        if blob is None:
+            if self._semantic is not None:
+                return self._semantic.get(key[0], key[1])
+            return None
+        translated = _unpack(blob)
+        with self._cache_lock:
+            self._cache[key] = blob if blob.startswith(ZSTD_MAGIC) else translated
+        return translated
+    
+    def _cache_store(self, key: Tuple[str, str, str], translated: str) -> None:
+        """Save a translation in memory and on disk, compressing long ones"""
+        blob = _pack(translated)
+        with self._cache_lock:
+            self._cache[key] = blob if blob.startswith(ZSTD_MAGIC) else translated
+        self._store.set(self._store_key(key), blob)
+        if self._semantic is not None:
+            self._semantic.add(key[0], key[1], translated)
     
     def translate(self, text: str, target_lang: str = 'en', source_lang: str = 'auto') -> Optional[str]:
         """
@@ -67,12 +309,228 @@ class Translator:
         Returns:
             Translated text or None if error
         """
-        if target_lang == 'en' or not text:
-            return text
+        return self._translator_for(target_lang, source_lang)(text)
+    
+    def _make_translator(self, target_lang: str, source_lang: str) -> Callable[[str], str]:
+        """
+        Build translate() specialized for one language pair.
+        
+        The language checks and attribute lookups are resolved once here
+        instead of on every call; _translator_for memoizes the result.
+        """
+        if target_lang == 'en':
+            return lambda text: text
+        
+        cache_lookup = self._cache_lookup
+        translate_coalesced = self._translate_coalesced
+        prefetched = self._prefetched
+        cache_lock = self._cache_lock
+        
+        def translate(text: str) -> str:
+            if not text or not _needs_translation(text, target_lang):
+                return text
+            
+            key = (text, target_lang, source_lang)
+            translated = cache_lookup(key)
+            if translated is not None:
+                with cache_lock:
+                    if prefetched.pop(key, None) is not None:
+                        self.prefetch_hits += 1
+                return translated
+            
+            translated = translate_coalesced(key)
+            return text if translated is None else translated
+        
+        return translate
+    
+    def _translate_coalesced(self, key: Tuple[str, str, str]) -> Optional[str]:
+        """
+        Fetch and cache the translation for key, sharing one request between
+        concurrent callers.
+        
+        Returns:
+            Translated text or None if it couldn't be translated
+        """
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+        
+        if not owner:
+            return future.result()
         
+        try:
+            try:
+                translated = self._translate_remote(*key)
+                self._cache_store(key, translated)
+            except TranslationError:
+                translated = None
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(translated)
+        finally:
+            with self._inflight_lock:
+                del self._inflight[key]
+        return translated
+    
+    def prefetch(self, text: str, target_lang: str, source_lang: str = 'auto') -> None:
+        """
+        Translate text in the background so a later translate() call for the
+        same text is served from the cache.
+        
+        Use this for text that is likely, but not certain, to be translated
+        soon (e.g. while the user is still typing). prefetch_count and
+        prefetch_hits tell how often prefetching paid off.
+        
+        Args:
+            text: Text to translate ahead of time
+            target_lang: Target language code
+            source_lang: Source language code or 'auto' for auto-detect
+        """
+        if target_lang == 'en' or not _needs_translation(text, target_lang):
+            return
+        
+        key = (text, target_lang, source_lang)
+        with self._cache_lock:
+            if key in self._cache or key in self._prefetched:
+                return
+            self._prefetched[key] = True
+            self.prefetch_count += 1
+        
+        self._executor.submit(self._prefetch_one, key)
+    
+    def _prefetch_one(self, key: Tuple[str, str, str]) -> None:
+        """Warm the caches for key without counting it as a prefetch hit"""
+        if self._cache_lookup(key) is not None:
+            return
+        if self._translate_coalesced(key) is None:
+            with self._cache_lock:
+                self._prefetched.pop(key, None)
+    
+    def translate_batch(self, texts: List[str], target_lang: str, source_lang: str = 'auto') -> List[str]:
+        """
+        Translate several texts with a single backend request.
+        
+        Cached texts are served from the caches; the rest are sent to
+        LibreTranslate together as one array. Texts with nothing to
+        translate are returned unchanged.
+        
+        Args:
+            texts: Texts to translate
+            target_lang: Target language code
+            source_lang: Source language code or 'auto' for auto-detect
+            
+        Returns:
+            Translated texts in the same order, with the original text for any
+            that couldn't be translated
+        """
+        results = list(texts)
+        if target_lang == 'en':
+            return results
+        
+        # Indices of every uncached text, so duplicates are translated once
+        misses: Dict[str, List[int]] = {}
+        for i, text in enumerate(texts):
+            if not _needs_translation(text, target_lang):
+                continue
+            translated = self._cache_lookup((text, target_lang, source_lang))
+            if translated is not None:
+                results[i] = translated
+            else:
+                misses.setdefault(text, []).append(i)
+        
+        if not misses:
+            return results
+        
+        pending = list(misses)
+        if len(pending) == 1:
+            translations = [self.translate(pending[0], target_lang, source_lang)]
+        else:
+            translations = self._translate_remote_many(pending, target_lang, source_lang)
+        
+        for text, translated in zip(pending, translations):
+            if translated is None:
+                continue
+            if len(pending) > 1:
+                self._cache_store((text, target_lang, source_lang), translated)
+            for i in misses[text]:
+                results[i] = translated
+        return results
+    
+    def translate_many(self, texts: List[str], target_lang: str, source_lang: str = 'auto') -> List[str]:
+        """
+        Translate independent texts concurrently, one request per text.
+        
+        Unlike translate_batch, each text is translated on its own, so a
+        failing text can't affect the others.
+        
+        Args:
+            texts: Texts to translate
+            target_lang: Target language code
+            source_lang: Source language code or 'auto' for auto-detect
+            
+        Returns:
+            Translated texts in the same order
+        """
+        if target_lang == 'en' or len(texts) < 2:
+            return [self.translate(text, target_lang, source_lang) for text in texts]
+        
+        return list(self._executor.map(lambda text: self.translate(text, target_lang, source_lang), texts))
+    
+    def _translate_remote_many(self, texts: List[str], target_lang: str,
+                               source_lang: str) -> List[Optional[str]]:
+        """
+        Translate several texts with one LibreTranslate request, falling back
+        to MyMemory in joined chunks of FALLBACK_BATCH_SIZE.
+        
+        Returns:
+            Translations in the same order, None for texts that couldn't be
+            translated
+        """
+        try:
+            response = self._session.post(
+                self.BASE_URL,
+                json={
+                    'q': texts,
+                    'source': source_lang,
+                    'target': target_lang,
+                    'format': 'text'
+                },
+                timeout=10
+            )
+            result = orjson.loads(response.content) if response.status_code == 200 else None
+        except (requests.RequestException, orjson.JSONDecodeError) as e:
+            logger.warning("LibreTranslate batch translation failed: %s", e)
+            result = None
+        
+        translated = result.get('translatedText') if isinstance(result, dict) else None
+        if isinstance(translated, list) and len(translated) == len(texts):
+            return translated
+        
+        translations: List[Optional[str]] = []
+        for start in range(0, len(texts), FALLBACK_BATCH_SIZE):
+            chunk = texts[start:start + FALLBACK_BATCH_SIZE]
+            joined = self._translate_fallback(BATCH_SEPARATOR.join(chunk), target_lang)
+            parts = BATCH_SPLIT_RE.split(joined.strip()) if joined else []
+            if len(parts) != len(chunk):
+                # MyMemory failed or mangled the separator; go one by one
+                parts = [self._translate_fallback(text, target_lang) for text in chunk]
+            translations.extend(parts)
+        return translations
+    
+    def _translate_remote(self, text: str, target_lang: str, source_lang: str) -> str:
+        """
+        Translate text with LibreTranslate, falling back to MyMemory.
+        
+        Raises:
+            TranslationError: If neither service returned a translation
+        """
         try:
             # Use LibreTranslate API
-            response = requests.post(
+            response = self._session.post(
                 self.BASE_URL,
                 data={
                     'q': text,
@@ -82,35 +540,36 @@ class Translator:
                 },
                 timeout=10
             )
-            
-            if response.status_code == 200:
-                result = response.json()
-                return result.get('translatedText', text)
-            else:
-                # Fallback: try alternative method
-                return self._translate_fallback(text, target_lang)
-                
-        except Exception as e:
-            print(f"Translation error: {e}")
-            # Fallback to simple method
-            return self._translate_fallback(text, target_lang)
+            result = orjson.loads(response.content) if response.status_code == 200 else None
+        except (requests.RequestException, orjson.JSONDecodeError) as e:
+            logger.warning("LibreTranslate translation failed: %s", e)
+            result = None
+        
+        if isinstance(result, dict) and 'translatedText' in result:
+            return result['translatedText']
+        
+        # Fallback: try alternative method
+        translated = self._translate_fallback(text, target_lang)
+        if translated is None:
+            raise TranslationError(f"Could not translate text to {target_lang}")
+        return translated
     
-    def _translate_fallback(self, text: str, target_lang: str) -> str:
-        """Fallback translation using MyMemory API"""
+    def _translate_fallback(self, text: str, target_lang: str) -> Optional[str]:
+        """Fallback translation using MyMemory API, None if it fails"""
+        params = {
+            'q': text,
+            'langpair': f'en|{target_lang}'
+        }
         try:
-            url = f"https://api.mymemory.translated.net/get"
-            params = {
-                'q': text,
-                'langpair': f'en|{target_lang}'
-            }
-            response = requests.get(url, params=params, timeout=10)
-            if response.status_code == 200:
-                data = response.json()
-                if data.get('responseStatus') == 200:
-                    return data['responseData']['translatedText']
-        except:
-            pass
-        return text
+            response = self._session.get(self.FALLBACK_URL, params=params, timeout=10)
+            data = orjson.loads(response.content) if response.status_code == 200 else None
+        except (requests.RequestException, orjson.JSONDecodeError) as e:
+            logger.warning("MyMemory translation failed: %s", e)
+            return None
+        
+        if isinstance(data, dict) and data.get('responseStatus') == 200:
+            return (data.get('responseData') or {}).get('translatedText')
+        return None
     
     def detect_language(self, text: str) -> str:
         """
@@ -122,33 +581,18 @@ class Translator:
         Returns:
             Language code
         """
-        try:
-            # Simple detection based on character sets
-            if any('\u3040' <= char <= '\u309F' or '\u30A0' <= char <= '\u30FF' for char in text):
-                return 'ja'  # Japanese
-            elif any('\u4e00' <= char <= '\u9fff' for char in text):
-                return 'zh'  # Chinese
-            elif any('\uAC00' <= char <= '\uD7A3' for char in text):
-                return 'ko'  # Korean
-            elif any('\u0600' <= char <= '\u06FF' for char in text):
-                return 'ar'  # Arabic
-            elif any('\u0900' <= char <= '\u097F' for char in text):
-                return 'hi'  # Hindi
-            elif any('\u0E00' <= char <= '\u0E7F' for char in text):
-                return 'th'  # Thai
-            else:
-                return 'en'  # Default to English
-        except:
-            return 'en'
+        return _detect_language(text)
     
-    def translate_response(self, response: str, target_lang: str, place_name: str = None) -> str:
+    def translate_response(self, response: str, target_lang: str,
+                           place_name: Union[str, List[str], None] = None) -> str:
         """
         Translate the response while preserving place names.
         
         Args:
             response: Response text to translate
             target_lang: Target language code
-            place_name: Place name to preserve (optional)
+            place_name: Place name, or list of place names, to preserve
+                (optional)
             
         Returns:
             Translated response
@@ -156,26 +600,40 @@ class Translator:
         if target_lang == 'en' or not response:
             return response
         
-        # Extract place name from response if not provided
-        if place_name:
-            # Temporarily replace place name with placeholder
-            placeholder = f"__PLACE__{hash(place_name)}__"
-            response = response.replace(place_name, placeholder)
+        # Temporarily replace place names with placeholders the translation
+        # backends leave alone
+        names = [place_name] if isinstance(place_name, str) else list(place_name or [])
+        names = list(dict.fromkeys(name for name in names if name))
+        if names:
+            # One pass for all names; longer names first so "New York City"
+            # isn't split by a match on "New York"
+            index = {name: i for i, name in enumerate(names)}
+            names_re = re.compile("|".join(map(re.escape, sorted(names, key=len, reverse=True))))
+            response = names_re.sub(lambda m: f"XPLACEHOLDERX{index[m.group(0)]}X", response)
         
-        # Translate
-        translated = self.translate(response, target_lang)
+        # Translate sentence by sentence: templated sentences ("Could not
+        # retrieve...", the places header) repeat across responses and are
+        # served from the translation cache, the rest go out in one batch
+        translated = "".join(self.translate_batch(SENTENCE_SPLIT_RE.split(response), target_lang))
         
-        # Restore place name
-        if place_name:
-            translated = translated.replace(placeholder, place_name)
+        # Restore place names
+        if names:
+            translated = PLACEHOLDER_RE.sub(
+                lambda m: names[int(m.group(1))] if int(m.group(1)) < len(names) else m.group(0),
+                translated
+            )
         
         return translated
     
-    def get_language_name(self, lang_code: str) -> str:
+    @staticmethod
+    def get_language_name(lang_code: str) -> str:
         """Get language name from code"""
-        return self.supported_languages.get(lang_code, lang_code)
+        return LANGUAGES.get(lang_code, lang_code)
 
 
 # Global translator instance
-translator = Translator()
+translator = Translator(
+    enable_semantic_cache=os.getenv('TRANSLATOR_SEMANTIC_CACHE') == '1',
+    cache_policy=os.getenv('TRANSLATOR_CACHE_POLICY', 'lru')
+)
 